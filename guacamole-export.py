@@ -1,5 +1,9 @@
 import psycopg2
-import json
+from psycopg2.extras import execute_batch, register_default_json
+from psycopg2.pool import ThreadedConnectionPool
+import argparse
+import functools
+import orjson
 import sys
 import os
 from urllib.parse import urlparse
@@ -12,131 +16,242 @@ DB_PORT = "5432"              # Default PostgreSQL port, change if needed
 DB_NAME = "guacamole_db"      # The database name Guacamole uses
 DB_USER = "guacamole_user"    # The database user Guacamole uses
 DB_PASS = "guacamole_user_password"    # The password for that user
+DB_POOL_MIN = 1               # Connections opened up front
+DB_POOL_MAX = 4               # Upper bound of pooled connections
 
 # Output file path
 OUTPUT_FILE = "guacamole_connections_db_export.json"
+OUTPUT_BUFFER_SIZE = 1 << 20  # 1 MiB write buffer, keeps the number of write syscalls low
 # --- End Configuration ---
 
 def connect_to_db(host, port, database, user, password):
     """
-    Connects to the PostgreSQL database.
+    Opens a pool of connections to the PostgreSQL database.
+    Queries take connections from the pool with getconn() and hand them back
+    with putconn(), so repeated queries reuse already established connections.
     """
     try:
-        conn = psycopg2.connect(
+        pool = ThreadedConnectionPool(
+            DB_POOL_MIN,
+            DB_POOL_MAX,
             host=host,
             port=port,
             database=database,
             user=user,
             password=password
         )
-        return conn
+        return pool
     except psycopg2.Error as e:
         print(f"Error connecting to PostgreSQL database: {e}")
         sys.exit(1)
 
-def fetch_connections_and_params(conn):
+def fetch_group_paths(conn):
     """
-    Fetches connections and their parameters from the database.
-    Joins guacamole_connection, guacamole_connection_group (for parent group),
-    and guacamole_connection_parameter.
+    Fetches the connection group tree and returns a function mapping a group ID
+    to its full path (e.g. "Parent/Child"), or '' for the ROOT group.
+    Paths are built once in Python instead of by a recursive query on the server.
     """
     cursor = conn.cursor()
+    query = """
+    SELECT connection_group_id, parent_id, connection_group_name
+    FROM guacamole_connection_group;
+    """
+
+    try:
+        cursor.execute(query)
+        # Each group ID maps to its (parent ID, name)
+        groups = {group_id: (parent_id, name) for group_id, parent_id, name in cursor}
+    except psycopg2.Error as e:
+        print(f"Error executing database query: {e}")
+        sys.exit(1)
+    finally:
+        cursor.close()
+
+    @functools.lru_cache(maxsize=None)
+    def path_of(group_id):
+        if group_id is None or group_id not in groups:
+            return ''
+        parent_id, name = groups[group_id]
+        parent_path = path_of(parent_id)
+        return f"{parent_path}/{name}" if parent_path else name
+
+    return path_of
+
+def fetch_connections_and_params(conn):
+    """
+    Fetches connections and their parameters from the database and yields
+    the connection objects one by one.
+    Joins guacamole_connection and guacamole_connection_parameter; the parent
+    group path comes from fetch_group_paths.
+    Parameters are aggregated into one JSON object per connection on the server,
+    and rows are streamed through a server-side cursor, so the full result set
+    is never held in memory.
+    The connection must not be returned to the pool before the generator is exhausted.
+    """
+    path_of = fetch_group_paths(conn)
+
+    # Named (server-side) cursors only work inside a transaction
+    conn.autocommit = False
+    cursor = conn.cursor(name='guac_export')
+    cursor.itersize = 10000 # Rows fetched from the server per round-trip
+    # Decode the aggregated json parameters with orjson instead of the stdlib json module
+    register_default_json(conn_or_curs=cursor, loads=orjson.loads)
 
-    # Query to get connection details, its parent group name (if not ROOT),
-    # and all its parameters (including encrypted password).
-    # This query focuses on getting the core data.
+    # Query to get connection details, its parent group ID,
+    # and all its parameters (including encrypted password) as a single JSON object.
+    # json (unlike jsonb) keeps the keys in aggregation order, i.e. sorted by parameter name.
+    # Sorting connections happens after aggregation, i.e. over one row per connection.
     query = """
-    WITH RECURSIVE connection_group_path AS (
-      SELECT
-        connection_group_id,
-        connection_group_name,
-        parent_id,
-        CAST(connection_group_name AS character varying) AS full_path
-      FROM guacamole_connection_group
-      WHERE parent_id IS NULL
-
-      UNION ALL
-
-      SELECT
-        cg.connection_group_id,
-        cg.connection_group_name,
-        cg.parent_id,
-        cgp.full_path || '/' || cg.connection_group_name AS full_path
-      FROM guacamole_connection_group cg
-      JOIN connection_group_path cgp ON cg.parent_id = cgp.connection_group_id
-    )
     SELECT
-        c.connection_id,
         c.connection_name,
-        'ROOT/' || COALESCE(cgp.full_path, '') AS group_path,
+        c.parent_id,
         c.protocol,
-        p.parameter_name,
-        p.parameter_value
+        COALESCE(
+            json_object_agg(p.parameter_name, p.parameter_value ORDER BY p.parameter_name)
+                FILTER (WHERE p.parameter_name IS NOT NULL),
+            '{}'::json
+        ) AS parameters
     FROM guacamole_connection c
-    LEFT JOIN connection_group_path cgp ON c.parent_id = cgp.connection_group_id
-    LEFT JOIN guacamole_connection_parameter p ON c.connection_id = p.connection_id
-    ORDER BY
-        c.connection_name,
-        p.parameter_name;
+    LEFT JOIN guacamole_connection_parameter p USING (connection_id)
+    GROUP BY c.connection_id
+    ORDER BY c.connection_name;
     """
 
     try:
         cursor.execute(query)
-        rows = cursor.fetchall()
-        return rows
+        for name, parent_id, protocol, parameters in cursor:
+            yield {
+                "name": name,
+                "protocol": protocol,
+                "group": 'ROOT/' + path_of(parent_id), # Full path of the parent group
+                "parameters": parameters # json is decoded to a dict by orjson
+            }
     except psycopg2.Error as e:
         print(f"Error executing database query: {e}")
         sys.exit(1)
     finally:
         cursor.close()
 
-def build_connection_dict(rows):
+def copy_connections(conn, f):
     """
-    Builds a dictionary of connections from the query results.
-    Each connection ID maps to its details (name, group, parameters).
+    Writes the whole export to the binary file f as a single JSON array built by
+    PostgreSQL itself and streamed with COPY ... TO STDOUT, so no Python object
+    is created per connection.
+    The group paths are resolved with a recursive query here, since nothing
+    is post-processed on the client.
     """
-    connections_map = {}
-
-    for row in rows:
-        conn_id, name, parent_id, group_name, param_name, param_value = row
+    cursor = conn.cursor()
 
-        if conn_id not in connections_map:
-            connections_map[conn_id] = {
-                "name": name,
-                "protocol": group_name,
-                "group": parent_id, # Include the parent group ID if needed for structure
-                "parameters": {}
-            }
+    # json (unlike jsonb) keeps keys in the order they are built, so objects come out
+    # as name, protocol, group, parameters with parameters sorted by name, like the
+    # default export. The array is joined with string_agg because json_agg puts
+    # newlines between elements.
+    # CSV format with quote/delimiter characters that never occur in the JSON text
+    # (control characters are escaped in it) copies it verbatim; a value containing a
+    # newline would get quoted, and the default text format would escape backslashes.
+    query = """
+    COPY (
+        WITH RECURSIVE connection_group_path AS (
+          SELECT
+            connection_group_id,
+            CAST(connection_group_name AS character varying) AS full_path
+          FROM guacamole_connection_group
+          WHERE parent_id IS NULL
 
-        # Add the parameter to the connection's parameter dictionary
-        if param_name is not None: # Handle cases where parameter_name might be NULL
-            connections_map[conn_id]["parameters"][param_name] = param_value
+          UNION ALL
 
-    # Convert the map values (which are the connection objects) into a list
-    return list(connections_map.values())
+          SELECT
+            cg.connection_group_id,
+            cgp.full_path || '/' || cg.connection_group_name AS full_path
+          FROM guacamole_connection_group cg
+          JOIN connection_group_path cgp ON cg.parent_id = cgp.connection_group_id
+        )
+        SELECT '[' || COALESCE(
+            string_agg(
+                json_build_object(
+                    'name', c.connection_name,
+                    'protocol', c.protocol,
+                    'group', 'ROOT/' || COALESCE(cgp.full_path, ''),
+                    'parameters', COALESCE(
+                        (SELECT json_object_agg(p.parameter_name, p.parameter_value ORDER BY p.parameter_name)
+                         FROM guacamole_connection_parameter p
+                         WHERE p.connection_id = c.connection_id),
+                        '{}'::json
+                    )
+                )::text,
+                ','
+                ORDER BY c.connection_name
+            ),
+            ''
+        ) || ']'
+        FROM guacamole_connection c
+        LEFT JOIN connection_group_path cgp ON c.parent_id = cgp.connection_group_id
+    ) TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')
+    """
 
+    try:
+        cursor.copy_expert(query, f)
+    except psycopg2.Error as e:
+        print(f"Error executing database query: {e}")
+        sys.exit(1)
+    finally:
+        cursor.close()
 
-def main():
-    print("Starting Guacamole PostgreSQL Export Script...")
-    print(f"Target Database: {DB_NAME} on {DB_HOST}:{DB_PORT}")
-    print(f"Target Output File: {OUTPUT_FILE}")
+def _import_connections(conn, rows):
+    """
+    Inserts connection parameters into the database.
+    rows is an iterable of (connection_id, parameter_name, parameter_value) tuples;
+    they are sent in batches of 1000 statements per round-trip instead of one by one.
+    Not used by the export itself, this is the base for a matching import.
+    """
+    query = """
+    INSERT INTO guacamole_connection_parameter (connection_id, parameter_name, parameter_value)
+    VALUES (%s, %s, %s);
+    """
 
-    # Validate configuration
-    if not all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS]):
-        print("Error: Please configure all DB_* variables in the script.")
+    try:
+        with conn.cursor() as cursor:
+            execute_batch(cursor, query, rows, page_size=1000)
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error executing database query: {e}")
         sys.exit(1)
 
-    print("\nConnecting to PostgreSQL database...")
-    conn = connect_to_db(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS)
-    print("Connected successfully.")
+def write_output_file(path, write):
+    """
+    Calls write(f) with a binary file and returns its result. The data goes to a
+    temporary file that replaces path only once write succeeded, so a failed
+    export never truncates or half-overwrites a previous one.
+    """
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+            result = write(f)
+        os.replace(tmp_path, path)
+        return result
+    except BaseException:
+        # Also covers sys.exit() from a failed query while streaming
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
-    print("\nFetching connections and parameters from database...")
-    raw_data = fetch_connections_and_params(conn)
-    print(f"Fetched {len(raw_data)} parameter rows.")
+def write_connections(f, connections, jsonl=False):
+    """
+    Writes connection objects to the binary file f and returns how many were written.
+    By default they are written as a single JSON array; with jsonl=True each
+    connection is written on its own line (JSON Lines) as soon as it is fetched,
+    so the connection list is never held in memory.
+    """
+    if jsonl:
+        count = 0
+        for connection in connections:
+            f.write(orjson.dumps(connection))
+            f.write(b'\n')
+            count += 1
+        return count
 
-    print("\nBuilding connection objects...")
-    connections_list = build_connection_dict(raw_data)
-    print(f"Built {len(connections_list)} connection objects.")
+    connections_list = connections if isinstance(connections, list) else list(connections)
 
     # Prepare the final output structure
     #export_data = {
@@ -147,19 +262,56 @@ def main():
     #}
     export_data = connections_list
 
-    print(f"\nWriting export to {OUTPUT_FILE}...")
+    # orjson serializes straight to UTF-8 bytes, so the file is written in one go
+    f.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2))
+    return len(connections_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exports Apache Guacamole connections from its PostgreSQL database.")
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument("--jsonl", action="store_true",
+                               help="write one connection object per line (JSON Lines) instead of a single JSON array")
+    output_format.add_argument("--copy", action="store_true",
+                               help="let PostgreSQL build the JSON array and stream it to the file with COPY (compact, fastest)")
+    args = parser.parse_args()
+
+    print("Starting Guacamole PostgreSQL Export Script...")
+    print(f"Target Database: {DB_NAME} on {DB_HOST}:{DB_PORT}")
+    print(f"Target Output File: {OUTPUT_FILE}")
+
+    # Validate configuration
+    if not all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS]):
+        print("Error: Please configure all DB_* variables in the script.")
+        sys.exit(1)
+
+    print("\nConnecting to PostgreSQL database...")
+    pool = connect_to_db(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS)
+    conn = pool.getconn()
+    print("Connected successfully.")
+
+    print(f"\nFetching connections and parameters from database and writing export to {OUTPUT_FILE}...")
     try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=4, ensure_ascii=False)
+        if args.copy:
+            write_output_file(OUTPUT_FILE, lambda f: copy_connections(conn, f))
+        else:
+            if args.jsonl:
+                connections = fetch_connections_and_params(conn)
+            else:
+                # Fetch everything before touching the output file, as before --jsonl existed
+                connections = list(fetch_connections_and_params(conn))
+            count = write_output_file(OUTPUT_FILE, lambda f: write_connections(f, connections, jsonl=args.jsonl))
+            print(f"Exported {count} connection objects.")
+        pool.putconn(conn)
         print(f"Export completed successfully. Data written to '{OUTPUT_FILE}'.")
         print("*** WARNING: This file contains sensitive data including ENCRYPTED passwords stored in the database. Store it securely and delete it after use. ***")
     except IOError as e:
         print(f"Error writing to file {OUTPUT_FILE}: {e}")
         sys.exit(1)
     finally:
-        # Ensure the database connection is closed
-        if conn:
-            conn.close()
+        # Ensure the database connections are closed
+        if pool:
+            pool.closeall()
             print("Database connection closed.")
 
 
@@ -1,206 +1,330 @@
-import xml.etree.ElementTree as ET
-import json
+from lxml import etree as ET
+import orjson
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def convert_rdm_to_guac_json(xml_file_path):
+# Converts RDM group path separators (backslashes) to Guacamole ones (slashes)
+_SLASH_TRANS = str.maketrans('\\', '/')
+
+# RDM tag names, interned once and shared by every lookup in the conversion loop
+_TAG_CONNECTION = sys.intern('Connection')
+_TAG_CONNECTION_TYPE = sys.intern('ConnectionType')
+_TAG_NAME = sys.intern('Name')
+_TAG_GROUP = sys.intern('Group')
+_TAG_URL = sys.intern('Url')
+_TAG_TERMINAL = sys.intern('Terminal')
+_TAG_RDP = sys.intern('RDP')
+_TAG_VNC = sys.intern('VNC')
+_TAG_HOST = sys.intern('Host')
+_TAG_HOST_PORT = sys.intern('HostPort')
+_TAG_PORT = sys.intern('Port')
+_TAG_USERNAME = sys.intern('Username')
+_TAG_USER_NAME = sys.intern('UserName')
+_TAG_DOMAIN = sys.intern('Domain')
+_TAG_SAFE_PASSWORD = sys.intern('SafePassword')
+_TAG_MS_SAFE_PASSWORD = sys.intern('MsSafePassword')
+_TAG_MS_USER = sys.intern('MsUser')
+_TAG_REMOTE_COMMAND = sys.intern('RemoteCommand')
+_TAG_SCREEN_SIZING_MODE = sys.intern('ScreenSizingMode')
+
+def _iter_connections(xml_file_path):
+    """
+    Streams the <Connection> elements of an RDM XML file in document order,
+    including Connections nested inside other Connections.
+    Each outermost element is cleared once the caller is done with it and its nested
+    Connections, together with already processed siblings, so memory stays flat
+    regardless of the file size.
+    """
+    for _, conn_element in ET.iterparse(xml_file_path, events=('end',), tag=_TAG_CONNECTION):
+        # Nested Connections are handled with their outermost Connection, pruning here
+        # would delete fields of the enclosing one that it still needs
+        if next(conn_element.iterancestors(_TAG_CONNECTION), None) is not None:
+            continue
+
+        # The element itself first, then the nested ones, like findall('.//Connection')
+        yield from conn_element.iter(_TAG_CONNECTION)
+        conn_element.clear()
+        parent = conn_element.getparent()
+        if parent is not None:
+            while conn_element.getprevious() is not None:
+                del parent[0]
+
+def _child_map(element):
+    """
+    Maps the tag of each direct child of element to that child, so the fields of a
+    connection or section are looked up in a dict instead of one find() scan per field.
+    The first child wins on duplicate tags, same as find().
+    """
+    return {child.tag: child for child in reversed(element)}
+
+def _port(port_elem, default):
+    """
+    Returns the port number stored in port_elem, or default if it is missing,
+    not a plain decimal number or outside the valid port range (1-65535).
+    """
+    text = port_elem.text if port_elem is not None else None
+    # isdigit() rejects signs, underscores and whitespace that int() would accept
+    if not text or not text.isdigit():
+        return default
+    try:
+        port = int(text)
+    except ValueError: # Non-ASCII digits such as '²'
+        return default
+    return port if 0 < port < 65536 else default
+
+def _make_guac(name, protocol, parameters, rdm_group_path):
+    """
+    Builds a Guacamole connection object. The RDM group, if any, becomes the
+    'group' attribute with backslashes converted to slashes and 'ROOT/' prepended.
+    """
+    return {
+        "name": name,
+        "protocol": protocol,
+        "parameters": parameters,
+        **({"group": 'ROOT/' + rdm_group_path.translate(_SLASH_TRANS)} if rdm_group_path else {})
+    }
+
+def _convert_ssh(conn_fields):
+    """
+    Converts an SSHShell connection, or returns None if it has no Terminal section.
+    """
+    terminal = conn_fields.get(_TAG_TERMINAL)
+    if terminal is None:
+        return None
+
+    fields = _child_map(terminal)
+    host_elem = fields.get(_TAG_HOST)
+    port_elem = fields.get(_TAG_HOST_PORT)
+    user_elem = fields.get(_TAG_USERNAME)
+    pass_elem = fields.get(_TAG_SAFE_PASSWORD) # Note: Encrypted in RDM
+    command_elem = fields.get(_TAG_REMOTE_COMMAND)
+    name_elem = conn_fields.get(_TAG_NAME)
+    # Extract the Group
+    group_elem = conn_fields.get(_TAG_GROUP)
+    rdm_group_path = group_elem.text if group_elem is not None else '' # Use empty string if no group
+
+    host = host_elem.text if host_elem is not None else ''
+    port = _port(port_elem, 22) # Default SSH port
+    username = user_elem.text if user_elem is not None else ''
+    password = pass_elem.text if pass_elem is not None else '' # Note: Encrypted
+    command = command_elem.text if command_elem is not None else ''
+    name = name_elem.text if name_elem is not None else f"SSH_{host}:{port}" # Fallback name
+
+    # Create a Guacamole-like connection object (basic structure)
+    return _make_guac(name, "ssh", { # Guacamole protocol
+        "hostname": host,
+        "port": port,
+        "username": username,
+        # 'password' field in Guacamole JSON often expects plain text or is handled via credentials provider.
+        # Using the RDM 'SafePassword' directly will likely fail without decryption.
+        # "password": password, # Omitting due to encryption mismatch
+        "remote-app": command if command else "", # 'remote-app' sometimes used for commands, or 'command'
+        "command": command if command else ""      # 'command' is another option in Guacamole
+    }, rdm_group_path)
+
+def _convert_rdp(conn_fields):
+    """
+    Converts an RDP or RDPConfigured connection, or returns None if it has no RDP section.
+    """
+    rdp_section = conn_fields.get(_TAG_RDP)
+    if rdp_section is None:
+        return None
+
+    fields = _child_map(rdp_section)
+    host_elem = fields.get(_TAG_HOST)
+    if host_elem is None:
+        host_elem = conn_fields.get(_TAG_URL) # RDP might use 'Url' instead of 'Host' in RDM
+    port_elem = fields.get(_TAG_PORT) # RDP port might be in RDP section
+    user_elem = fields.get(_TAG_USER_NAME)
+    pass_elem = fields.get(_TAG_SAFE_PASSWORD) # Note: Encrypted in RDM
+    domain_elem = fields.get(_TAG_DOMAIN)
+    name_elem = conn_fields.get(_TAG_NAME)
+    # Extract the Group
+    group_elem = conn_fields.get(_TAG_GROUP)
+    rdm_group_path = group_elem.text if group_elem is not None else '' # Use empty string if no group
+    # Screen sizing mode
+    screen_mode_elem = fields.get(_TAG_SCREEN_SIZING_MODE)
+    screen_mode = screen_mode_elem.text if screen_mode_elem is not None else ''
+
+    host = host_elem.text if host_elem is not None else ''
+    # Default RDP port if not specified
+    port = _port(port_elem, 3389)
+    username = user_elem.text if user_elem is not None else ''
+    password = pass_elem.text if pass_elem is not None else '' # Note: Encrypted
+    domain = domain_elem.text if domain_elem is not None else ''
+    name = name_elem.text if name_elem is not None else f"RDP_{host}:{port}" # Fallback name
+
+    guac_params = {
+        "hostname": host,
+        "port": port,
+        "username": username,
+        # "password": password, # Omitting due to encryption mismatch
+    }
+    if domain:
+        guac_params["domain"] = domain
+
+    # Map RDM screen sizing to Guacamole display mode
+    if screen_mode == 'FitToWindow':
+        guac_params["resize-method"] = "scale" # Guacamole's equivalent
+    elif screen_mode == 'FullScreen':
+        guac_params["resize-method"] = "none" # Or potentially use fullscreen parameters
+        # guac_params["enable-fullscreen"] = "true" # Alternative Guacamole param
+
+    # Create a Guacamole-like connection object (basic structure)
+    return _make_guac(name, "rdp", guac_params, rdm_group_path) # Guacamole protocol
+
+def _convert_vnc(conn_fields):
+    """
+    Converts a VNC connection, or returns None if it has no VNC section.
     """
-    Converts an RDM XML export file to a JSON array of basic Guacamole connection definitions.
+    vnc_section = conn_fields.get(_TAG_VNC)
+    if vnc_section is None:
+        return None
+
+    fields = _child_map(vnc_section)
+    host_elem = fields.get(_TAG_HOST)
+    port_elem = fields.get(_TAG_PORT)
+    pass_elem = fields.get(_TAG_MS_SAFE_PASSWORD) # VNC might use MsSafePassword or SafePassword
+    user_elem = fields.get(_TAG_MS_USER) # VNC might use MsUser or Username
+    name_elem = conn_fields.get(_TAG_NAME)
+    # Extract the Group
+    group_elem = conn_fields.get(_TAG_GROUP)
+    rdm_group_path = group_elem.text if group_elem is not None else '' # Use empty string if no group
+
+    host = host_elem.text if host_elem is not None else ''
+    port = _port(port_elem, 5900)
+    password = pass_elem.text if pass_elem is not None else '' # Note: Encrypted
+    username = user_elem.text if user_elem is not None else '' # VNC often doesn't use username, but RDM might store it
+    name = name_elem.text if name_elem is not None else f"VNC_{host}:{port}" # Fallback name
+
+    guac_params = {
+        "hostname": host,
+        "port": port,
+        # "password": password, # Omitting due to encryption mismatch
+    }
+    if username:
+        guac_params["username"] = username # Add username if present
+
+    return _make_guac(name, "vnc", guac_params, rdm_group_path) # Guacamole protocol
+
+# Converter for each supported RDM ConnectionType, called with the
+# _child_map() of the <Connection> element
+_HANDLERS = {
+    'SSHShell': _convert_ssh,
+    'RDP': _convert_rdp,
+    'RDPConfigured': _convert_rdp, # Handle both standard and configured RDP types
+    'VNC': _convert_vnc,
+}
+
+def _read_connections(xml_file_path):
+    """
+    Reads the supported connections of one RDM XML export file.
 
     Args:
         xml_file_path (str): Path to the input RDM XML file.
 
     Returns:
-        str: The resulting JSON string, or an error message.
+        tuple: (list of Guacamole connection objects, None), or (None, error message).
     """
     if not os.path.exists(xml_file_path):
-        return f"Error: File not found: {xml_file_path}"
+        return None, f"Error: File not found: {xml_file_path}"
 
-    try:
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-    except ET.ParseError as e:
-        return f"Error parsing XML file: {e}"
-    except Exception as e:
-        return f"Error reading file: {e}"
+    connections = []
+
+    # Only reading and parsing the file is guarded, errors in the conversion itself propagate
+    conn_elements = _iter_connections(xml_file_path)
+    while True:
+        try:
+            conn_element = next(conn_elements)
+        except StopIteration:
+            break
+        except ET.ParseError as e:
+            return None, f"Error parsing XML file: {e}"
+        except Exception as e:
+            return None, f"Error reading file: {e}"
+
+        # Index the Connection's children once, the handlers look up everything else in it
+        conn_fields = _child_map(conn_element)
+        conn_type_elem = conn_fields.get(_TAG_CONNECTION_TYPE)
+        if conn_type_elem is None:
+            continue
+
+        # If the connection type isn't handled, skip to the next element
+        handler = _HANDLERS.get(conn_type_elem.text)
+        if handler is None:
+            continue
+
+        guac_connection = handler(conn_fields)
+        # Skip supported types whose protocol section is missing
+        if guac_connection is not None:
+            connections.append(guac_connection) # Add the connection object to the list
+
+    return connections, None
+
+def convert_rdm_to_guac_json(*xml_file_paths):
+    """
+    Converts one or more RDM XML export files to a JSON array of basic Guacamole connection definitions.
+    Several files are parsed in parallel worker processes.
+
+    Args:
+        *xml_file_paths (str): Paths to the input RDM XML files.
+
+    Returns:
+        str: The resulting JSON string, or an error message.
+    """
+    if len(xml_file_paths) == 1:
+        results = [_read_connections(xml_file_paths[0])]
+    else:
+        # No more workers than files, each worker converts one whole file
+        with ProcessPoolExecutor(max_workers=min(len(xml_file_paths), os.cpu_count() or 1)) as executor:
+            results = list(executor.map(_read_connections, xml_file_paths))
 
     connections = []
     used_names = set() # Keep track of names already added to the JSON
+    next_suffix = {} # (original name, protocol) -> next suffix number to try
 
-    # Iterate through each Connection element
-    for conn_element in root.findall('.//Connection'):
-        conn_type_elem = conn_element.find('ConnectionType')
-        if conn_type_elem is not None:
-            conn_type = conn_type_elem.text
-
-            # --- SSH Conversion ---
-            if conn_type == 'SSHShell':
-                terminal = conn_element.find('Terminal')
-                if terminal is not None:
-                    host_elem = terminal.find('Host')
-                    port_elem = terminal.find('HostPort')
-                    user_elem = terminal.find('Username')
-                    pass_elem = terminal.find('SafePassword') # Note: Encrypted in RDM
-                    command_elem = terminal.find('RemoteCommand')
-                    name_elem = conn_element.find('Name')
-                    # Extract the Group
-                    group_elem = conn_element.find('Group')
-                    rdm_group_path = group_elem.text if group_elem is not None else '' # Use empty string if no group
-
-                    host = host_elem.text if host_elem is not None else ''
-                    port = int(port_elem.text) if port_elem is not None and port_elem.text.isdigit() else 22 # Default SSH port
-                    username = user_elem.text if user_elem is not None else ''
-                    password = pass_elem.text if pass_elem is not None else '' # Note: Encrypted
-                    command = command_elem.text if command_elem is not None else ''
-                    name = name_elem.text if name_elem is not None else f"SSH_{host}:{port}" # Fallback name
-                    protocol = "SSH"
-
-                    # Create a Guacamole-like connection object (basic structure)
-                    guac_connection = {
-                        "name": name,
-                        "protocol": "ssh", # Guacamole protocol
-                        "parameters": {
-                            "hostname": host,
-                            "port": port,
-                            "username": username,
-                            # 'password' field in Guacamole JSON often expects plain text or is handled via credentials provider.
-                            # Using the RDM 'SafePassword' directly will likely fail without decryption.
-                            # "password": password, # Omitting due to encryption mismatch
-                            "remote-app": command if command else "", # 'remote-app' sometimes used for commands, or 'command'
-                            "command": command if command else ""      # 'command' is another option in Guacamole
-                        }
-                    }
-                    # Add the RDM group as the 'group' attribute for Guacamole, converting path separators
-                    if rdm_group_path:
-                        # Replace backslashes with forward slashes and prepend 'ROOT/'
-                        guac_group_path = 'ROOT/' + rdm_group_path.replace('\\', '/')
-                        guac_connection["group"] = guac_group_path
-
-            # --- RDP Conversion ---
-            elif conn_type in ['RDP', 'RDPConfigured']: # Handle both standard and configured RDP types
-                rdp_section = conn_element.find('RDP')
-                if rdp_section is not None:
-                    host_elem = rdp_section.find('Host') or conn_element.find('Url') # RDP might use 'Url' instead of 'Host' in RDM
-                    port_elem = rdp_section.find('Port') # RDP port might be in RDP section
-                    user_elem = rdp_section.find('UserName')
-                    pass_elem = rdp_section.find('SafePassword') # Note: Encrypted in RDM
-                    domain_elem = rdp_section.find('Domain')
-                    name_elem = conn_element.find('Name')
-                    # Extract the Group
-                    group_elem = conn_element.find('Group')
-                    rdm_group_path = group_elem.text if group_elem is not None else '' # Use empty string if no group
-                    # Screen sizing mode
-                    screen_mode_elem = rdp_section.find('ScreenSizingMode')
-                    screen_mode = screen_mode_elem.text if screen_mode_elem is not None else ''
-
-                    host = host_elem.text if host_elem is not None else ''
-                    # Default RDP port if not specified
-                    port = int(port_elem.text) if port_elem is not None and port_elem.text.isdigit() else 3389
-                    username = user_elem.text if user_elem is not None else ''
-                    password = pass_elem.text if pass_elem is not None else '' # Note: Encrypted
-                    domain = domain_elem.text if domain_elem is not None else ''
-                    name = name_elem.text if name_elem is not None else f"RDP_{host}:{port}" # Fallback name
-                    protocol = "RDP"
-
-                    guac_params = {
-                        "hostname": host,
-                        "port": port,
-                        "username": username,
-                        # "password": password, # Omitting due to encryption mismatch
-                    }
-                    if domain:
-                        guac_params["domain"] = domain
-
-                    # Map RDM screen sizing to Guacamole display mode
-                    if screen_mode == 'FitToWindow':
-                        guac_params["resize-method"] = "scale" # Guacamole's equivalent
-                    elif screen_mode == 'FullScreen':
-                         guac_params["resize-method"] = "none" # Or potentially use fullscreen parameters
-                         # guac_params["enable-fullscreen"] = "true" # Alternative Guacamole param
-
-                    # Create a Guacamole-like connection object (basic structure)
-                    guac_connection = {
-                        "name": name,
-                        "protocol": "rdp", # Guacamole protocol
-                        "parameters": guac_params
-                    }
-                    # Add the RDM group as the 'group' attribute for Guacamole, converting path separators
-                    if rdm_group_path:
-                        # Replace backslashes with forward slashes and prepend 'ROOT/'
-                        guac_group_path = 'ROOT/' + rdm_group_path.replace('\\', '/')
-                        guac_connection["group"] = guac_group_path
-
-            # --- VNC Conversion (if applicable) ---
-            elif conn_type == 'VNC':
-                 vnc_section = conn_element.find('VNC')
-                 if vnc_section is not None:
-                     host_elem = vnc_section.find('Host')
-                     port_elem = vnc_section.find('Port')
-                     pass_elem = vnc_section.find('MsSafePassword') # VNC might use MsSafePassword or SafePassword
-                     user_elem = vnc_section.find('MsUser') # VNC might use MsUser or Username
-                     name_elem = conn_element.find('Name')
-                     # Extract the Group
-                     group_elem = conn_element.find('Group')
-                     rdm_group_path = group_elem.text if group_elem is not None else '' # Use empty string if no group
-
-                     host = host_elem.text if host_elem is not None else ''
-                     port = int(port_elem.text) if port_elem is not None and port_elem.text.isdigit() else 5900
-                     password = pass_elem.text if pass_elem is not None else '' # Note: Encrypted
-                     username = user_elem.text if user_elem is not None else '' # VNC often doesn't use username, but RDM might store it
-                     name = name_elem.text if name_elem is not None else f"VNC_{host}:{port}" # Fallback name
-                     protocol = "VNC"
-
-                     guac_params = {
-                         "hostname": host,
-                         "port": port,
-                         # "password": password, # Omitting due to encryption mismatch
-                     }
-                     if username:
-                         guac_params["username"] = username # Add username if present
-
-                     guac_connection = {
-                         "name": name,
-                         "protocol": "vnc", # Guacamole protocol
-                         "parameters": guac_params
-                     }
-                     # Add the RDM group as the 'group' attribute for Guacamole, converting path separators
-                     if rdm_group_path:
-                         # Replace backslashes with forward slashes and prepend 'ROOT/'
-                         guac_group_path = 'ROOT/' + rdm_group_path.replace('\\', '/')
-                         guac_connection["group"] = guac_group_path
-
-            # --- Handle Connection Object (if created) ---
-            else:
-                 # If the connection type isn't handled, skip to the next element
-                 continue
+    for file_connections, error in results:
+        if error:
+            return error
 
+        for guac_connection in file_connections:
             # --- Name Uniqueness Check ---
+            # Taken names get a "(PROTOCOL)" suffix, then "_2", "_3", ... until the name is free.
+            # Suffix numbers already tried are remembered per (name, protocol), so each
+            # candidate is only checked once.
             original_name = guac_connection["name"]
             unique_name = original_name
-            counter = 1
-            while unique_name in used_names:
-                unique_name = f"{original_name} ({protocol})"
-                if counter > 1:
-                    unique_name += f"_{counter}"
-                counter += 1
+            if unique_name in used_names:
+                protocol = guac_connection["protocol"].upper()
+                key = (original_name, protocol)
+                counter = next_suffix.get(key, 1)
+                while True:
+                    unique_name = f"{original_name} ({protocol})"
+                    if counter > 1:
+                        unique_name += f"_{counter}"
+                    counter += 1
+                    if unique_name not in used_names:
+                        break
+                next_suffix[key] = counter
 
             guac_connection["name"] = unique_name
             used_names.add(unique_name) # Add the final unique name to the set
-            connections.append(guac_connection) # Add the connection object to the list
-
+            connections.append(guac_connection)
 
     # Output the resulting JSON
     if connections:
-        return json.dumps(connections, indent=4)
+        return orjson.dumps(connections, option=orjson.OPT_INDENT_2).decode()
     else:
         return "No supported connections (SSHShell, RDP, RDPConfigured, VNC) found in the provided XML."
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python rdm_to_guac_json.py <path_to_rdm_xml_file>")
+    if len(sys.argv) < 2:
+        print("Usage: python rdm_to_guac_json.py <path_to_rdm_xml_file> [<path_to_rdm_xml_file> ...]")
         sys.exit(1)
 
-    input_xml_file = sys.argv[1]
-    result_json = convert_rdm_to_guac_json(input_xml_file)
+    input_xml_files = sys.argv[1:]
+    result_json = convert_rdm_to_guac_json(*input_xml_files)
 
-    print(result_json)
\ No newline at end of file
+    # The JSON is not ASCII-escaped, write it as UTF-8 regardless of the console/locale encoding
+    sys.stdout.buffer.write(result_json.encode('utf-8') + b'\n')
\ No newline at end of file